@@ -0,0 +1,417 @@
+"""PostToolUse hook - tracks edited files for CLAUDE.md updates.
+
+Fires after Edit, Write, or Bash tool execution. Appends changed file
+paths to .claude/auto-memory/dirty-files for batch processing at turn end.
+Produces no output to maintain zero token cost.
+
+Supports configurable trigger modes:
+- default: Track Edit/Write/Bash operations (current behavior)
+- gitmode: Only track git commits
+
+When a git commit is detected, enriches each file path with inline commit
+context: /path/to/file [hash: commit message]
+
+Runs as a fresh interpreter per tool call, so only modules needed on every
+event are imported at top level; subprocess (and shlex, for commands with
+backslash escapes) is imported lazily on the paths that actually use it.
+The entry point is the post-tool-use.py launcher; keeping the logic in this
+importable module lets repeat runs load cached bytecode instead of
+recompiling it.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections.abc import Mapping
+
+# Bash commands that don't modify files (matched as command prefixes)
+SKIP_PREFIXES = (
+    "ls", "cat", "echo", "grep", "find", "head", "tail", "less", "more",
+    "cd", "pwd", "which", "whereis", "type", "file", "stat", "wc",
+    "git status", "git log", "git diff", "git show", "git branch",
+    "git fetch", "git pull", "git push", "git clone", "git checkout",
+    "git stash", "git remote", "git tag", "git rev-parse",
+    "npm ", "yarn ", "pnpm ", "node ", "python", "pip ", "uv ",
+    "cargo ", "go ", "make", "cmake", "docker ", "kubectl ",
+    "curl ", "wget ", "ssh ", "scp ", "rsync ",
+)
+
+
+def _index_by_first_char(prefixes: tuple[str, ...]) -> dict[str, tuple[str, ...]]:
+    """Bucket prefixes by first character so a lookup only compares viable candidates."""
+    index: dict[str, tuple[str, ...]] = {}
+    for prefix in prefixes:
+        index[prefix[0]] = index.get(prefix[0], ()) + (prefix,)
+    return index
+
+
+SKIP_PREFIXES_BY_CHAR = _index_by_first_char(SKIP_PREFIXES)
+
+# Shell operators that chain commands - stop parsing at these
+SHELL_OPERATORS = frozenset(("&&", "||", ";", "|", ">", ">>", "<", "2>", "2>&1"))
+
+
+def load_config(project_dir: str) -> dict:
+    """Load plugin configuration from .claude/auto-memory/config.json."""
+    config_file = os.path.join(project_dir, ".claude", "auto-memory", "config.json")
+    try:
+        with open(config_file) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {"triggerMode": "default"}
+
+
+def handle_git_commit(project_dir: str) -> tuple[list[str], dict | None]:
+    """Extract context from a git commit.
+
+    Returns: (files, commit_context) where commit_context is {"hash": ..., "message": ...}
+    """
+    import subprocess
+
+    # One git call for hash, subject, and committed files. Output is
+    # "<hash>\0<subject>\n\n<file>\n<file>..." (no file block for empty commits)
+    result = subprocess.run(
+        ["git", "log", "-1", "--name-only", "--no-renames", "--format=%h%x00%s"],
+        capture_output=True,
+        cwd=project_dir,
+    )
+    if result.returncode != 0:
+        return [], None
+
+    header, _, names = result.stdout.partition(b"\n")
+    commit_hash, _, commit_message = header.partition(b"\x00")
+    context = {
+        "hash": commit_hash.decode(),
+        "message": commit_message.decode(errors="replace"),
+    }
+
+    # Make absolute (lexically - no symlink resolution needed for tracking)
+    files = [
+        os.path.normpath(os.path.join(project_dir, name.decode(errors="replace")))
+        for name in names.split(b"\n")
+        if name.strip()
+    ]
+
+    return files, context
+
+
+def should_track(file_path: str, project_prefix: str) -> bool:
+    """Check if file should be tracked for CLAUDE.md updates.
+
+    project_prefix is the case-normalized project directory with a trailing
+    separator (see project_prefix()), computed once per hook call. file_path
+    must be normalized (os.path.normpath) for the prefix checks to be reliable.
+    """
+    # Compare case-insensitively where the filesystem is (Windows)
+    file_path = os.path.normcase(file_path)
+
+    # Only track files within the project directory
+    if not file_path.startswith(project_prefix):
+        return False  # File outside project - don't track
+    relative = file_path[len(project_prefix):]
+
+    # Exclude .claude/ directory (plugin state files)
+    if relative == ".claude" or relative.startswith(".claude" + os.sep):
+        return False
+
+    # Exclude CLAUDE.md files anywhere (prevents infinite loops)
+    if os.path.basename(relative) == os.path.normcase("CLAUDE.md"):
+        return False
+
+    return True
+
+
+def project_prefix(project_dir: str) -> str:
+    """Return the case-normalized absolute project directory with a trailing separator."""
+    return os.path.normcase(os.path.join(os.path.abspath(project_dir), ""))
+
+
+def split_command(command: str) -> list[str]:
+    """Split a shell command into words, honoring single and double quotes.
+
+    Covers the quoting seen in rm/mv/unlink commands without the overhead of
+    shlex's general-purpose lexer. Commands with backslash escapes fall back
+    to shlex.split. Raises ValueError on unbalanced quotes, like shlex.
+    """
+    if "\\" in command:
+        import shlex
+
+        return shlex.split(command)
+
+    if "'" not in command and '"' not in command:
+        return command.split()
+
+    tokens: list[str] = []
+    buf: list[str] = []
+    in_token = False
+    quote = ""
+    for char in command:
+        if quote:
+            if char == quote:
+                quote = ""
+            else:
+                buf.append(char)
+        elif char == "'" or char == '"':
+            quote = char
+            in_token = True
+        elif char in " \t\r\n":
+            if in_token:
+                tokens.append("".join(buf))
+                buf.clear()
+                in_token = False
+        else:
+            buf.append(char)
+            in_token = True
+
+    if quote:
+        raise ValueError("No closing quotation")
+    if in_token:
+        tokens.append("".join(buf))
+    return tokens
+
+
+def _all_file_args(args: list[str]) -> list[str]:
+    """Collect non-flag arguments until a shell operator (rm, git rm)."""
+    files = []
+    for token in args:
+        if token in SHELL_OPERATORS:
+            break  # Stop at command chaining operator
+        if not token.startswith("-"):
+            files.append(token)
+    return files
+
+
+def _source_arg(args: list[str]) -> list[str]:
+    """Return the first non-flag argument - the source, not destination (mv, git mv)."""
+    if len(args) < 2:
+        return []
+    for token in args:
+        if token in SHELL_OPERATORS:
+            break
+        if not token.startswith("-"):
+            return [token]
+    return []
+
+
+def _single_arg(args: list[str]) -> list[str]:
+    """Return the sole operand (unlink)."""
+    if args and args[0] not in SHELL_OPERATORS:
+        return [args[0]]
+    return []
+
+
+# Handlers keyed on (command, git subcommand or None); each receives the
+# arguments that follow the command words
+BASH_HANDLERS = {
+    ("rm", None): _all_file_args,
+    ("git", "rm"): _all_file_args,
+    ("mv", None): _source_arg,
+    ("git", "mv"): _source_arg,
+    ("unlink", None): _single_arg,
+}
+
+
+def extract_files_from_bash(command: str, project_dir: str) -> list[str]:
+    """Extract file paths from Bash commands that modify files.
+
+    Detects: rm, rm -rf, mv, git rm, git mv, unlink
+    Returns list of file paths that should be tracked.
+    """
+    if not command:
+        return []
+
+    # Normalize command (strip leading/trailing whitespace)
+    command = command.strip()
+
+    # Skip commands that don't modify files
+    if command.startswith(SKIP_PREFIXES_BY_CHAR.get(command[:1], ())):
+        return []
+
+    try:
+        # Parse command into tokens
+        tokens = split_command(command)
+    except ValueError:
+        # Tokenizing failed (unbalanced quotes, etc.) - skip
+        return []
+
+    if not tokens:
+        return []
+
+    # Dispatch on command word (plus subcommand for git)
+    is_git = tokens[0] == "git"
+    key = (tokens[0], tokens[1] if is_git and len(tokens) > 1 else None)
+    handler = BASH_HANDLERS.get(key)
+    if handler is None:
+        return []
+
+    files = handler(tokens[2:] if is_git else tokens[1:])
+
+    # Make paths absolute relative to project directory (string ops only, no stat)
+    return [os.path.normpath(os.path.join(project_dir, f)) for f in files]
+
+
+def read_tracked(dirty_file: str) -> tuple[dict[str, str], bool]:
+    """Return entries tracked this turn and whether the log lacks a final newline.
+
+    Entries are a dict of path -> latest full line. The stop hook rotates
+    dirty-files at the end of every turn, so the file doubles as the
+    turn-scoped memo of paths that need no further writes. The log may also
+    be rewritten by /auto-memory:sync or the agent without a trailing newline,
+    in which case the next append must start on a new line.
+    """
+    try:
+        # append_lines writes UTF-8; don't let the locale encoding decide
+        with open(dirty_file, encoding="utf-8") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {}, False
+
+    tracked: dict[str, str] = {}
+    for line in data.splitlines():
+        line = line.strip()
+        if line:
+            # Key on the path (strip commit context if present)
+            tracked[line.split(" [", 1)[0]] = line
+    return tracked, bool(data) and not data.endswith("\n")
+
+
+def append_lines(fd: int, lines: list[str], newline_first: bool = False) -> None:
+    """Append newline-terminated lines to an open file descriptor in one syscall.
+
+    newline_first terminates an unterminated last line already in the file.
+    """
+    bufs = [line.encode() + b"\n" for line in lines]
+    if newline_first:
+        bufs[0] = b"\n" + bufs[0]
+    if hasattr(os, "writev"):
+        os.writev(fd, bufs)
+    else:
+        # Windows has no writev; a single joined write is equivalent
+        os.write(fd, b"".join(bufs))
+
+
+def track_tool_use(stdin_data: str, project_dir: str) -> None:
+    """Record files touched by one tool call in the dirty-files log."""
+    if not stdin_data:
+        return
+
+    # Load configuration
+    config = load_config(project_dir)
+    trigger_mode = config.get("triggerMode", "default")
+
+    # In gitmode, a payload that never mentions a git commit can be dropped
+    # before paying for the JSON parse
+    if trigger_mode == "gitmode" and "git commit" not in stdin_data:
+        return
+
+    try:
+        tool_input = json.loads(stdin_data)
+    except json.JSONDecodeError:
+        tool_input = {}
+
+    tool_name = tool_input.get("tool_name", "")
+    tool_input_data = tool_input.get("tool_input", {})
+
+    # Check if this is a git commit (anywhere in the command, handles chained commands)
+    is_git_commit = False
+    command = ""
+    if tool_name == "Bash":
+        command = tool_input_data.get("command", "").strip()
+        is_git_commit = "git commit" in command
+
+    # In gitmode, only process git commits
+    if trigger_mode == "gitmode" and not is_git_commit:
+        return
+
+    files_to_track = []
+    commit_context = None
+
+    # Handle git commit specially - extract commit context
+    if is_git_commit:
+        files, commit_context = handle_git_commit(project_dir)
+        files_to_track.extend(files)
+
+    # Handle Edit/Write tools - extract file_path directly, normalized so
+    # forms like <proj>/./.claude/x can't slip past the prefix checks
+    elif tool_name in ("Edit", "Write"):
+        file_path = tool_input_data.get("file_path", "")
+        if file_path:
+            files_to_track.append(os.path.normpath(file_path))
+
+    # Handle Bash tool - parse command for file operations
+    elif tool_name == "Bash":
+        files_to_track = extract_files_from_bash(command, project_dir)
+
+    # Legacy support: if no tool_name, try file_path directly
+    elif not tool_name:
+        file_path = tool_input_data.get("file_path", "")
+        if file_path:
+            files_to_track.append(os.path.normpath(file_path))
+
+    if not files_to_track:
+        return
+
+    # Filter to only trackable files, dropping repeats (order preserved)
+    prefix = project_prefix(project_dir)
+    trackable = list(dict.fromkeys(f for f in files_to_track if should_track(f, prefix)))
+
+    if not trackable:
+        return
+
+    # Paths already tracked this turn (path -> full line)
+    auto_memory_dir = os.path.join(project_dir, ".claude", "auto-memory")
+    dirty_file = os.path.join(auto_memory_dir, "dirty-files")
+    existing, unterminated = read_tracked(dirty_file)
+
+    # Collect new or changed entries; lines already on disk are never rewritten
+    new_lines: list[str] = []
+    for file_path in trackable:
+        if commit_context:
+            # Commit context version supersedes an earlier plain entry
+            ctx = f"[{commit_context['hash']}: {commit_context['message']}]"
+            line = f"{file_path} {ctx}"
+            if existing.get(file_path) != line:
+                new_lines.append(line)
+                existing[file_path] = line
+        elif file_path not in existing:
+            # Only add if not already tracked
+            new_lines.append(file_path)
+            existing[file_path] = file_path
+
+    if not new_lines:
+        return
+
+    # Append all entries in one write; O_APPEND keeps concurrent hooks from clobbering
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    try:
+        fd = os.open(dirty_file, flags, 0o644)
+    except FileNotFoundError:
+        # First write for this project - create the auto-memory directory
+        os.makedirs(auto_memory_dir, exist_ok=True)
+        fd = os.open(dirty_file, flags, 0o644)
+    try:
+        append_lines(fd, new_lines, newline_first=unterminated)
+    finally:
+        os.close(fd)
+
+
+def run(stdin_text: str, env: Mapping[str, str]) -> tuple[int, str, str]:
+    """Handle one PostToolUse event, returning (exit code, stdout, stderr)."""
+    project_dir = env.get("CLAUDE_PROJECT_DIR", os.getcwd())
+    if project_dir:
+        track_tool_use(stdin_text, project_dir)
+
+    # NO output - zero token cost
+    return 0, "", ""
+
+
+def main():
+    rc, stdout, stderr = run(sys.stdin.read(), os.environ)
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,65 +3,170 @@
 
 This hook fires at the end of Claude's turn. If files were modified
 during the turn, it blocks and instructs Claude to spawn the
-memory-updater agent for CLAUDE.md updates.
+memory-updater agent for CLAUDE.md updates, then rotates dirty-files to
+dirty-files.processing for the agent so each turn starts with an empty log.
+Entries left in dirty-files.processing (agent never ran) block again.
 """
+from __future__ import annotations
+
 import json
 import os
 import sys
-from pathlib import Path
+from collections.abc import Mapping, Sequence
 
+# Maximum number of files listed in the block message
+MAX_FILES = 20
 
-def main():
-    project_dir = os.environ.get("CLAUDE_PROJECT_DIR", "")
+# Bytes read from the end of dirty-files when collecting recent paths
+TAIL_BYTES = 64 * 1024
+
+# Block message shown to Claude; {files} is the comma-separated file list
+REASON_TEMPLATE = (
+    "Files were modified this turn. Use the Task tool to spawn "
+    "'memory-updater' agent with prompt: 'Update CLAUDE.md for "
+    "changed files: {files}'. After the agent completes, use the "
+    "Read tool to read the root CLAUDE.md file to refresh your memory."
+)
+
+
+def append_file(src: str, dst: str) -> None:
+    """Append the contents of src to dst, creating dst if needed."""
+    with open(src, "rb") as f_src, open(dst, "a+b") as f_dst:
+        data = f_src.read()
+        # The agent or /auto-memory:sync may rewrite dst without a trailing newline
+        size = f_dst.seek(0, os.SEEK_END)
+        if size:
+            f_dst.seek(size - 1)
+            if f_dst.read(1) != b"\n":
+                data = b"\n" + data
+        f_dst.write(data)  # Append mode writes at the end regardless of position
+
+
+def rotate_dirty_file(dirty_file: str) -> None:
+    """Move dirty-files aside as dirty-files.processing for the memory-updater agent.
+
+    The log is first renamed to a per-process staging name; the rename is
+    atomic, so only one of several concurrent stop hooks claims it and later
+    PostToolUse appends start a fresh dirty-files. Entries are merged into any
+    .processing file the agent has not consumed yet. If the hand-over fails,
+    the staged entries are appended back to dirty-files before re-raising.
+    """
+    processing = dirty_file + ".processing"
+    staging = f"{dirty_file}.{os.getpid()}"
+    try:
+        os.replace(dirty_file, staging)
+    except FileNotFoundError:
+        return  # Already claimed by another stop hook
+
+    try:
+        if not os.path.exists(processing):
+            os.replace(staging, processing)
+            return
+        append_file(staging, processing)
+    except BaseException:
+        append_file(staging, dirty_file)
+        os.remove(staging)
+        raise
+    os.remove(staging)
+
+
+def read_tail(path: str, size: int) -> list[bytes]:
+    """Return the lines in the last TAIL_BYTES of a log of the given size.
+
+    Reading only the tail keeps work bounded however long the session has
+    been appending to the log.
+    """
+    with open(path, "rb") as f:
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+    lines = tail.split(b"\n")
+    if size > TAIL_BYTES:
+        lines = lines[1:]  # First line may be cut mid-path
+    return lines
+
+
+def dedupe_and_limit(lines: Sequence[bytes], max_n: int = MAX_FILES) -> list[str]:
+    """Return the newest max_n unique paths from dirty-files lines, sorted.
+
+    Lines may have inline commit context: /path/to/file [hash: message]
+    """
+    unique: set[bytes] = set()
+    for line in reversed(lines):
+        path = line.split(b" [", 1)[0].strip()
+        if path:
+            unique.add(path)
+            if len(unique) >= max_n:
+                break
+    return sorted(path.decode() for path in unique)
+
+
+def run(stdin_text: str, env: Mapping[str, str]) -> tuple[int, str, str]:
+    """Handle one Stop event, returning (exit code, stdout, stderr)."""
+    project_dir = env.get("CLAUDE_PROJECT_DIR", "")
     if not project_dir:
-        return
+        return 0, "", ""
 
-    # Read stdin (JSON with stop_hook_active flag)
+    # Parse stdin (JSON with stop_hook_active flag)
     try:
-        input_data = json.loads(sys.stdin.read())
+        input_data = json.loads(stdin_text)
     except json.JSONDecodeError:
         input_data = {}
 
     # Pass through if already processing (prevent infinite loop)
     if input_data.get("stop_hook_active", False):
-        return
-
-    dirty_file = Path(project_dir) / ".claude" / "auto-memory" / "dirty-files"
-
-    # Pass through if no dirty files
-    if not dirty_file.exists() or dirty_file.stat().st_size == 0:
-        return
-
-    # Get unique file list (max 20 files in message)
-    # Lines may have inline commit context: /path/to/file [hash: message]
-    with open(dirty_file) as f:
-        files = set()
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            # Strip inline commit context if present
-            if " [" in line:
-                line = line.split(" [")[0]
-            files.add(line)
-        files = sorted(files)[:20]
+        return 0, "", ""
 
-    if not files:
-        return
+    dirty_file = os.path.join(project_dir, ".claude", "auto-memory", "dirty-files")
+    processing = dirty_file + ".processing"
+
+    # Entries handed over at an earlier stop that the agent never consumed
+    # (interrupted or skipped) still count, oldest log first. One stat per
+    # log covers missing and empty.
+    lines: list[bytes] = []
+    dirty_size = 0
+    for path in (processing, dirty_file):
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            continue
+        if size:
+            lines.extend(read_tail(path, size))
+            if path == dirty_file:
+                dirty_size = size
 
-    files_str = ", ".join(files)
+    # Pass through if neither log has entries
+    if not lines:
+        return 0, "", ""
+
+    # Get unique file list (max 20 files in message), newest entries first
+    files = dedupe_and_limit(lines)
+    if not files:
+        return 0, "", ""
 
     # Output block decision
     output = {
         "decision": "block",
-        "reason": (
-            f"Files were modified this turn. Use the Task tool to spawn "
-            f"'memory-updater' agent with prompt: 'Update CLAUDE.md for "
-            f"changed files: {files_str}'. After the agent completes, use the "
-            f"Read tool to read the root CLAUDE.md file to refresh your memory."
-        ),
+        "reason": REASON_TEMPLATE.format(files=", ".join(files)),
     }
-    print(json.dumps(output))
+
+    # Hand the log to the memory-updater agent so the next turn starts empty.
+    # A failed rotation (e.g. a Windows sharing violation while a PostToolUse
+    # hook has the file open) must not cost the block decision; the entries
+    # are put back in dirty-files and handed over at the next stop.
+    if dirty_size:
+        try:
+            rotate_dirty_file(dirty_file)
+        except OSError:
+            pass
+
+    return 0, json.dumps(output) + "\n", ""
+
+
+def main():
+    rc, stdout, stderr = run(sys.stdin.read(), os.environ)
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(rc)
 
 
 if __name__ == "__main__":
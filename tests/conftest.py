@@ -0,0 +1,41 @@
+"""Shared pytest fixtures for the auto-memory test suite."""
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def spawn_counter(monkeypatch):
+    """Count subprocesses started during a test.
+
+    Yields a one-element list holding the number of Popen constructions, so
+    tests can assert that hook code paths do not grow extra process spawns.
+    """
+    count = [0]
+    original_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        count[0] += 1
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(subprocess.Popen, "__init__", counting_init)
+    yield count
+
+
+@pytest.fixture(scope="session")
+def file_text():
+    """Return a reader that loads each file's text once per session.
+
+    Test modules that check the same plugin files share the cached text
+    instead of reading them from disk again.
+    """
+    cache: dict[str, str] = {}
+
+    def read(path: Path) -> str:
+        key = str(path)
+        if key not in cache:
+            cache[key] = path.read_bytes().decode("utf-8")
+        return cache[key]
+
+    return read
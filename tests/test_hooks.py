@@ -1,235 +1,368 @@
 """Tests for hook scripts."""
 import json
+import ntpath
 import os
+import shutil
 import subprocess
 import sys
+from importlib import import_module
 from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
 
 # Add scripts directory to path
 SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
 
+# Subprocess argv parts, resolved to strings once
+PY = sys.executable
+POST_TOOL_USE = str(SCRIPTS_DIR / "post-tool-use.py")
+STOP_HOOK = str(SCRIPTS_DIR / "stop.py")
+
+HAS_GIT = shutil.which("git") is not None
+
+# Minimal environment for hook subprocesses, built once instead of copying
+# os.environ per call
+_BASE_ENV = {
+    k: v
+    for k, v in os.environ.items()
+    if k.startswith(("PATH", "HOME", "LANG", "LC_", "PYTHON", "SYSTEMROOT", "TMP", "TEMP"))
+}
+
+
+# Interpreter flags for hook subprocesses. Hook scripts are stdlib only, so
+# -I (isolated) and -S (no site, as in hooks.json) just cut startup work.
+_ISOLATED = ("-I", "-S")
+
+
+def _env(**overrides: str) -> dict[str, str]:
+    """Subprocess environment: the base env plus overrides."""
+    return {**_BASE_ENV, **overrides}
+
+
+_TOOL_TEMPLATE = '{"tool_name": "%s", "tool_input": {"file_path": "%s"}}'
+_BASH_TEMPLATE = '{"tool_name": "Bash", "tool_input": {"command": "%s"}}'
+
+
+def _json_str(value: str) -> str:
+    """Escape a string for embedding between quotes in a JSON template."""
+    if not value.isprintable():
+        return json.dumps(value)[1:-1]
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _make_tool_input(file_path: str, tool_name: str = "Edit") -> str:
+    """Create JSON input for post-tool-use hook (Edit/Write tools)."""
+    return _TOOL_TEMPLATE % (tool_name, _json_str(file_path))
+
+
+def _make_bash_input(command: str) -> str:
+    """Create JSON input for Bash tool."""
+    return _BASH_TEMPLATE % _json_str(command)
+
+
+def _import_script(name: str):
+    """Import a hook module from scripts/ for in-process run() calls."""
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    try:
+        return import_module(name)
+    finally:
+        sys.path.remove(str(SCRIPTS_DIR))
+
+
+@pytest.fixture(scope="module")
+def post_tool_use():
+    """post_tool_use hook module, imported once per test module."""
+    return _import_script("post_tool_use")
+
+
+@pytest.fixture(scope="module")
+def stop_hook():
+    """stop hook module, imported once per test module."""
+    return _import_script("stop")
+
+
+def _listed_files(stop_hook, reason: str) -> list[str]:
+    """File list embedded in a stop hook block reason."""
+    prefix, suffix = stop_hook.REASON_TEMPLATE.split("{files}")
+    assert reason.startswith(prefix)
+    assert reason.endswith(suffix)
+    return reason[len(prefix):len(reason) - len(suffix)].split(", ")
+
+
+@pytest.fixture
+def dirty_file(tmp_path):
+    """dirty-files path under tmp_path, with its parent directory created."""
+    path = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+    path.parent.mkdir(parents=True)
+    return path
+
+
+@pytest.fixture
+def dirty_with_one_file(dirty_file):
+    """dirty-files holding a single tracked path."""
+    dirty_file.write_text("/path/to/file.py\n")
+    return dirty_file
+
+
+@pytest.fixture(scope="session")
+def git_repo_template(tmp_path_factory):
+    """Git repo with an initial commit, created once per session.
+
+    The initial commit gives later commits a parent to diff against.
+    """
+    template = tmp_path_factory.mktemp("git-template")
+    (template / ".gitkeep").touch()
+    for args in (
+        ["init", "-q"],
+        ["config", "user.email", "test@test.com"],
+        ["config", "user.name", "Test User"],
+        ["config", "commit.gpgsign", "false"],
+        ["add", ".gitkeep"],
+        ["commit", "-q", "-m", "Initial commit"],
+    ):
+        subprocess.run(["git", *args], cwd=template, check=True)
+    return template
+
+
+def _git_commit(repo: Path, file_name: str, message: str) -> None:
+    """Stage and commit one file."""
+    subprocess.run(["git", "add", file_name], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", message], cwd=repo, check=True)
+
+
+@pytest.fixture
+def git_repo(tmp_path, git_repo_template):
+    """Per-test copy of the template git repo."""
+    repo = tmp_path / "repo"
+    shutil.copytree(git_repo_template, repo)
+    return repo
+
 
 class TestPostToolUseHook:
     """Tests for post-tool-use.py hook."""
 
-    def _make_tool_input(self, file_path: str, tool_name: str = "Edit") -> str:
-        """Create JSON input for post-tool-use hook (Edit/Write tools)."""
-        return json.dumps({
-            "tool_name": tool_name,
-            "tool_input": {"file_path": file_path},
-        })
-
-    def _make_bash_input(self, command: str) -> str:
-        """Create JSON input for Bash tool."""
-        return json.dumps({
-            "tool_name": "Bash",
-            "tool_input": {"command": command},
-        })
-
-    def test_creates_dirty_file(self, tmp_path):
-        """Hook creates .claude/.dirty-files if it doesn't exist."""
+    def test_creates_dirty_file(self, tmp_path, post_tool_use):
+        """Hook creates .claude/auto-memory/dirty-files if it doesn't exist."""
         file_path = str(tmp_path / "file.py")
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(file_path),
-            capture_output=True,
-            text=True,
-        )
-        assert result.returncode == 0
+        rc, _, _ = post_tool_use.run(_make_tool_input(file_path), env)
+        assert rc == 0
         dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
         assert dirty_file.exists()
 
-    def test_appends_paths(self, tmp_path):
+    def test_appends_paths(self, tmp_path, dirty_file, post_tool_use):
         """Hook appends file paths to dirty file."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
         existing_file = str(tmp_path / "existing" / "file.py")
         dirty_file.write_text(existing_file + "\n")
 
         new_file = str(tmp_path / "new" / "file.py")
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(new_file),
-            capture_output=True,
-            text=True,
-        )
+        post_tool_use.run(_make_tool_input(new_file), env)
         content = dirty_file.read_text()
         assert existing_file in content
         assert new_file in content
 
-    def test_no_output(self, tmp_path):
-        """Hook produces no output (zero token cost)."""
+    def test_does_not_duplicate_tracked_path(self, tmp_path, dirty_file, post_tool_use):
+        """Hook skips the write when the path is already tracked."""
         file_path = str(tmp_path / "file.py")
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        for _ in range(2):
+            post_tool_use.run(_make_tool_input(file_path), env)
+        assert dirty_file.read_text() == file_path + "\n"
+
+    def test_edit_spawns_no_subprocess(self, tmp_path, spawn_counter, post_tool_use):
+        """Edit tracking stays in-process (no git or shell spawns)."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_tool_input(str(tmp_path / "file.py")), env)
+        post_tool_use.run(_make_bash_input("rm old.py"), env)
+        assert spawn_counter[0] == 0
+
+    def test_does_not_duplicate_non_ascii_path(self, tmp_path, dirty_file, post_tool_use):
+        """Hook dedups non-ASCII paths (log is written and read as UTF-8)."""
+        file_path = str(tmp_path / "caf\u00e9_\u00c1.py")
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        for _ in range(2):
+            post_tool_use.run(_make_tool_input(file_path), env)
+        assert dirty_file.read_bytes() == file_path.encode() + b"\n"
+
+    def test_appends_after_unterminated_last_line(self, tmp_path, dirty_file, post_tool_use):
+        """Hook starts a new line when the log was rewritten without a final newline."""
+        dirty_file.write_text("/a.py\n/b.py")
+        new_file = str(tmp_path / "c.py")
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_tool_input(new_file), env)
+        assert dirty_file.read_text() == f"/a.py\n/b.py\n{new_file}\n"
+
+    def test_tracks_again_after_rotation(self, tmp_path, dirty_file, post_tool_use):
+        """Paths handed to the agent at turn end are tracked again next turn."""
+        file_path = str(tmp_path / "file.py")
+        processing = dirty_file.parent / "dirty-files.processing"
+        processing.write_text(file_path + "\n")
+
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_tool_input(file_path), env)
+        assert dirty_file.read_text() == file_path + "\n"
+
+    def test_no_output(self, tmp_path):
+        """Hook script run end-to-end produces no output (zero token cost)."""
+        file_path = str(tmp_path / "file.py")
         result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(file_path),
+            [PY, *_ISOLATED, POST_TOOL_USE],
+            env=_env(CLAUDE_PROJECT_DIR=str(tmp_path)),
+            input=_make_tool_input(file_path),
             capture_output=True,
             text=True,
         )
         assert result.stdout == ""
         assert result.stderr == ""
 
-    def test_handles_missing_input(self):
+    def test_handles_missing_input(self, post_tool_use):
         """Hook exits gracefully when input is missing."""
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={},
-            input="{}",
-            capture_output=True,
-            text=True,
-        )
-        assert result.returncode == 0
+        rc, _, _ = post_tool_use.run("{}", {})
+        assert rc == 0
 
-    def test_excludes_claude_directory(self, tmp_path):
+    def test_excludes_claude_directory(self, tmp_path, dirty_file, post_tool_use):
         """Hook excludes files in .claude/ directory."""
         file_path = str(tmp_path / ".claude" / "state.json")
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(file_path),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_tool_input(file_path), env)
+        assert not dirty_file.exists()
+
+    @pytest.mark.parametrize("subpath", ["./.claude/settings.json", "/.claude/x.json"])
+    def test_excludes_unnormalized_claude_path(self, tmp_path, dirty_file, post_tool_use, subpath):
+        """Hook excludes .claude/ even when the path has ./ or // segments."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_tool_input(str(tmp_path) + "/" + subpath), env)
         assert not dirty_file.exists()
 
-    def test_excludes_claude_md(self, tmp_path):
+    def test_prefix_checks_ignore_case_on_windows(self, monkeypatch, post_tool_use):
+        """Windows paths match the project and exclusions regardless of case."""
+        monkeypatch.setattr(post_tool_use, "os", SimpleNamespace(path=ntpath, sep="\\"))
+        prefix = post_tool_use.project_prefix("C:\\Proj")
+        assert post_tool_use.should_track("c:\\proj\\src\\App.py", prefix)
+        assert not post_tool_use.should_track("C:\\PROJ\\.Claude\\state.json", prefix)
+        assert not post_tool_use.should_track("C:\\Proj\\docs\\claude.md", prefix)
+        assert not post_tool_use.should_track("C:\\Other\\App.py", prefix)
+
+    def test_excludes_claude_md(self, tmp_path, dirty_file, post_tool_use):
         """Hook excludes CLAUDE.md files."""
         file_path = str(tmp_path / "CLAUDE.md")
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(file_path),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_tool_input(file_path), env)
         assert not dirty_file.exists()
 
-    def test_excludes_files_outside_project(self, tmp_path):
+    def test_excludes_files_outside_project(self, tmp_path, dirty_file, post_tool_use):
         """Hook excludes files outside project directory."""
         file_path = "/outside/project/file.py"
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_tool_input(file_path),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_tool_input(file_path), env)
+        assert not dirty_file.exists()
+
+    def test_excludes_sibling_directory_with_shared_prefix(self, tmp_path, post_tool_use):
+        """Hook excludes files in a sibling directory whose name extends the project's."""
+        project_dir = tmp_path / "project"
+        file_path = str(tmp_path / "project-other" / "file.py")
+        env = {"CLAUDE_PROJECT_DIR": str(project_dir)}
+        post_tool_use.run(_make_tool_input(file_path), env)
+        dirty_file = project_dir / ".claude" / "auto-memory" / "dirty-files"
+        assert not dirty_file.exists()
+
+    def test_gitmode_ignores_edits(self, tmp_path, dirty_file, post_tool_use):
+        """Hook ignores Edit events when triggerMode is gitmode."""
+        config_file = dirty_file.parent / "config.json"
+        config_file.write_text('{"triggerMode": "gitmode"}')
+
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_tool_input(str(tmp_path / "file.py")), env)
         assert not dirty_file.exists()
 
     # Bash command tracking tests
 
-    def test_tracks_rm_command(self, tmp_path):
+    def test_tracks_rm_command(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks files from rm command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm file.py"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("rm file.py"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "file.py" in content
 
-    def test_tracks_rm_with_flags(self, tmp_path):
+    def test_tracks_rm_with_flags(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks files from rm -rf command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm -rf src/old_module"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("rm -rf src/old_module"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "old_module" in content
 
-    def test_tracks_rm_multiple_files(self, tmp_path):
+    def test_tracks_rm_multiple_files(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks multiple files from rm command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm file1.py file2.py file3.py"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("rm file1.py file2.py file3.py"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "file1.py" in content
         assert "file2.py" in content
         assert "file3.py" in content
 
-    def test_tracks_git_rm_command(self, tmp_path):
+    def test_normalizes_relative_paths(self, tmp_path, dirty_file, post_tool_use):
+        """Hook normalizes relative Bash paths against the project directory."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input("rm ./src/../old.py"), env)
+        assert dirty_file.read_text() == str(tmp_path / "old.py") + "\n"
+
+    def test_tracks_quoted_path(self, tmp_path, dirty_file, post_tool_use):
+        """Hook keeps quoted paths with spaces as a single file."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input("rm 'my file.py'"), env)
+        assert dirty_file.read_text() == str(tmp_path / "my file.py") + "\n"
+
+    def test_deduplicates_repeated_bash_paths(self, tmp_path, dirty_file, post_tool_use):
+        """Hook writes a path once even if the command repeats it."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input("rm a.py b.py a.py"), env)
+        assert dirty_file.read_text().splitlines() == [
+            str(tmp_path / "a.py"),
+            str(tmp_path / "b.py"),
+        ]
+
+    def test_tracks_git_rm_command(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks files from git rm command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("git rm obsolete.py"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("git rm obsolete.py"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "obsolete.py" in content
 
-    def test_tracks_mv_source(self, tmp_path):
+    def test_tracks_mv_source(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks source file from mv command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("mv old_name.py new_name.py"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("mv old_name.py new_name.py"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "old_name.py" in content
         # Should NOT track destination
         assert content.count("new_name.py") == 0 or "old_name.py" in content
 
-    def test_tracks_unlink_command(self, tmp_path):
+    def test_tracks_git_mv_source(self, tmp_path, dirty_file, post_tool_use):
+        """Hook tracks only the source file from git mv command."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input("git mv -f old_name.py new_name.py"), env)
+        content = dirty_file.read_text()
+        assert "old_name.py" in content
+        assert "new_name.py" not in content
+
+    def test_tracks_unlink_command(self, tmp_path, dirty_file, post_tool_use):
         """Hook tracks files from unlink command."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("unlink temp.txt"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        post_tool_use.run(_make_bash_input("unlink temp.txt"), env)
         assert dirty_file.exists()
         content = dirty_file.read_text()
         assert "temp.txt" in content
 
-    def test_ignores_non_file_bash_commands(self, tmp_path):
-        """Hook ignores Bash commands that don't modify files."""
-        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-
-        # Test various non-file commands
-        non_file_commands = [
+    @pytest.mark.parametrize(
+        "cmd",
+        [
             "git status",
             "ls -la",
             "cat file.py",
@@ -237,306 +370,274 @@ class TestPostToolUseHook:
             "python --version",
             "echo hello",
             "grep pattern file.py",
-        ]
-
-        for cmd in non_file_commands:
-            subprocess.run(
-                [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-                env={**os.environ, **env},
-                input=self._make_bash_input(cmd),
-                capture_output=True,
-                text=True,
-            )
+        ],
+    )
+    def test_ignores_non_file_bash_command(self, tmp_path, dirty_file, post_tool_use, cmd):
+        """Hook ignores Bash commands that don't modify files."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input(cmd), env)
 
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
         assert not dirty_file.exists()
 
-    def test_bash_no_output(self, tmp_path):
+    def test_bash_no_output(self, tmp_path, post_tool_use):
         """Hook produces no output for Bash commands (zero token cost)."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm file.py"),
-            capture_output=True,
-            text=True,
-        )
-        assert result.stdout == ""
-        assert result.stderr == ""
-
-    def test_stops_at_shell_operators(self, tmp_path):
-        """Hook stops parsing at shell operators like && || ; |."""
+        _, stdout, stderr = post_tool_use.run(_make_bash_input("rm file.py"), env)
+        assert stdout == ""
+        assert stderr == ""
+
+    @pytest.mark.parametrize(
+        ("cmd", "tracked"),
+        [
+            ("rm file.py && echo done", "file.py"),
+            ("rm old.py ; ls -la", "old.py"),
+            ("rm -rf build | tee log.txt", "build"),
+            ("rm deleted.py > /dev/null", "deleted.py"),
+        ],
+        ids=["and", "semicolon", "pipe", "redirect"],
+    )
+    def test_stops_at_shell_operator(self, tmp_path, dirty_file, post_tool_use, cmd, tracked):
+        """Hook stops parsing at shell operators like && ; | >."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        post_tool_use.run(_make_bash_input(cmd), env)
+        # Only the rm target is tracked, nothing after the operator
+        assert dirty_file.read_text() == str(tmp_path / tracked) + "\n"
 
-        # Test && operator - should only track file.py, not 'echo' or 'done'
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm file.py && echo done"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        assert dirty_file.exists()
-        content = dirty_file.read_text()
-        assert "file.py" in content
-        assert "echo" not in content
-        assert "done" not in content
-        assert "&&" not in content
 
-    def test_stops_at_semicolon(self, tmp_path):
-        """Hook stops parsing at semicolon operator."""
+class TestStopHook:
+    """Tests for stop.py hook."""
+
+    def test_passes_when_empty(self, tmp_path, stop_hook):
+        """Hook passes through when no dirty files exist."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm old.py ; ls -la"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        content = dirty_file.read_text()
-        assert "old.py" in content
-        assert "ls" not in content
-        assert "-la" not in content
+        rc, stdout, _ = stop_hook.run("{}", env)
+        assert rc == 0
+        assert stdout == ""
 
-    def test_stops_at_pipe(self, tmp_path):
-        """Hook stops parsing at pipe operator."""
+    def test_passes_when_active(self, tmp_path, dirty_with_one_file, stop_hook):
+        """Hook passes through when stop_hook_active is true."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm -rf build | tee log.txt"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        content = dirty_file.read_text()
-        assert "build" in content
-        assert "tee" not in content
-        assert "log.txt" not in content
+        rc, stdout, _ = stop_hook.run('{"stop_hook_active": true}', env)
+        assert rc == 0
+        assert stdout == ""
 
-    def test_stops_at_redirect(self, tmp_path):
-        """Hook stops parsing at redirect operators."""
+    def test_blocks_with_files(self, tmp_path, dirty_with_one_file, stop_hook):
+        """Hook blocks and outputs JSON when dirty files exist."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("rm deleted.py > /dev/null"),
-            capture_output=True,
-            text=True,
-        )
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        content = dirty_file.read_text()
-        assert "deleted.py" in content
-        assert "/dev/null" not in content
+        rc, stdout, _ = stop_hook.run("{}", env)
+        assert rc == 0
+        output = json.loads(stdout)
+        assert output["decision"] == "block"
+        assert "memory-updater" in output["reason"]
 
+    def test_rotates_dirty_file(self, tmp_path, dirty_with_one_file, stop_hook):
+        """Hook moves dirty files to dirty-files.processing after blocking."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        stop_hook.run("{}", env)
+        processing = dirty_with_one_file.parent / "dirty-files.processing"
+        assert not dirty_with_one_file.exists()
+        assert processing.read_text() == "/path/to/file.py\n"
 
-class TestStopHook:
-    """Tests for stop.py hook."""
+    def test_rotation_merges_unprocessed_entries(self, tmp_path, dirty_file, stop_hook):
+        """Hook appends to a dirty-files.processing the agent has not consumed."""
+        processing = dirty_file.parent / "dirty-files.processing"
+        processing.write_text("/old.py\n")
+        dirty_file.write_text("/new.py\n")
 
-    def test_passes_when_empty(self, tmp_path):
-        """Hook passes through when no dirty files exist."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input="{}",
-            capture_output=True,
-            text=True,
-        )
-        assert result.returncode == 0
-        assert result.stdout == ""
-
-    def test_passes_when_active(self, tmp_path):
-        """Hook passes through when stop_hook_active is true."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
-        dirty_file.write_text("/path/to/file.py\n")
+        stop_hook.run("{}", env)
+        assert not dirty_file.exists()
+        assert processing.read_text() == "/old.py\n/new.py\n"
+        assert [p.name for p in dirty_file.parent.iterdir()] == ["dirty-files.processing"]
 
+    def test_blocks_again_when_agent_never_ran(self, tmp_path, dirty_with_one_file, stop_hook):
+        """Hook re-blocks on handed-over entries when the next turn has no edits."""
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input='{"stop_hook_active": true}',
-            capture_output=True,
-            text=True,
-        )
-        assert result.returncode == 0
-        assert result.stdout == ""
+        stop_hook.run("{}", env)  # Blocks and rotates; agent never clears it
 
-    def test_blocks_with_files(self, tmp_path):
-        """Hook blocks and outputs JSON when dirty files exist."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
-        dirty_file.write_text("/path/to/file.py\n")
+        rc, stdout, _ = stop_hook.run("{}", env)
+        assert rc == 0
+        output = json.loads(stdout)
+        assert output["decision"] == "block"
+        assert _listed_files(stop_hook, output["reason"]) == ["/path/to/file.py"]
+        processing = dirty_with_one_file.parent / "dirty-files.processing"
+        assert processing.read_text() == "/path/to/file.py\n"
+
+    def test_lists_pending_and_new_entries(self, tmp_path, dirty_file, stop_hook):
+        """Hook lists unconsumed handed-over entries alongside this turn's edits."""
+        (dirty_file.parent / "dirty-files.processing").write_text("/old.py\n")
+        dirty_file.write_text("/new.py\n")
 
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input="{}",
-            capture_output=True,
-            text=True,
-        )
-        assert result.returncode == 0
-        output = json.loads(result.stdout)
-        assert output["decision"] == "block"
-        assert "memory-updater" in output["reason"]
+        _, stdout, _ = stop_hook.run("{}", env)
+        reason = json.loads(stdout)["reason"]
+        assert _listed_files(stop_hook, reason) == ["/new.py", "/old.py"]
+
+    def test_blocks_when_rotation_fails(
+        self, tmp_path, dirty_with_one_file, stop_hook, monkeypatch
+    ):
+        """Hook still outputs the block decision if rotating the log fails."""
+        def deny(*args):
+            raise PermissionError("file in use")
+
+        monkeypatch.setattr(stop_hook.os, "replace", deny)
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        rc, stdout, _ = stop_hook.run("{}", env)
+        assert rc == 0
+        assert json.loads(stdout)["decision"] == "block"
+        assert dirty_with_one_file.read_text() == "/path/to/file.py\n"
+
+    def test_restores_entries_when_hand_over_fails(
+        self, tmp_path, dirty_with_one_file, stop_hook, monkeypatch
+    ):
+        """Entries return to dirty-files if moving them to .processing fails."""
+        original_replace = stop_hook.os.replace
+        calls = []
+
+        def deny_second(src, dst):
+            calls.append(dst)
+            if len(calls) == 2:
+                raise PermissionError("file in use")
+            original_replace(src, dst)
+
+        monkeypatch.setattr(stop_hook.os, "replace", deny_second)
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        _, stdout, _ = stop_hook.run("{}", env)
+        assert json.loads(stdout)["decision"] == "block"
+        assert dirty_with_one_file.read_text() == "/path/to/file.py\n"
+        assert sorted(p.name for p in dirty_with_one_file.parent.iterdir()) == ["dirty-files"]
+
+        monkeypatch.undo()
+        _, stdout, _ = stop_hook.run("{}", env)
+        assert json.loads(stdout)["decision"] == "block"
+
+    def test_restores_entries_when_merge_fails(
+        self, tmp_path, dirty_with_one_file, stop_hook, monkeypatch
+    ):
+        """Entries return to dirty-files if appending to .processing fails."""
+        processing = dirty_with_one_file.parent / "dirty-files.processing"
+        processing.write_text("/pending.py\n")
+        original_append = stop_hook.append_file
+
+        def deny_processing(src, dst):
+            if dst == str(processing):
+                raise OSError("disk full")
+            original_append(src, dst)
+
+        monkeypatch.setattr(stop_hook, "append_file", deny_processing)
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        _, stdout, _ = stop_hook.run("{}", env)
+        assert json.loads(stdout)["decision"] == "block"
+        assert dirty_with_one_file.read_text() == "/path/to/file.py\n"
+        assert processing.read_text() == "/pending.py\n"
+        assert sorted(p.name for p in processing.parent.iterdir()) == [
+            "dirty-files",
+            "dirty-files.processing",
+        ]
 
-    def test_json_format(self, tmp_path):
-        """Hook output is valid JSON with required fields."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
-        dirty_file.write_text("/path/to/file.py\n")
+    def test_rotation_merges_into_unterminated_processing(self, tmp_path, dirty_file, stop_hook):
+        """Merged entries start on a new line if .processing lacks a final newline."""
+        processing = dirty_file.parent / "dirty-files.processing"
+        processing.write_text("/old.py")
+        dirty_file.write_text("/new.py\n")
 
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        stop_hook.run("{}", env)
+        assert processing.read_text() == "/old.py\n/new.py\n"
+
+    def test_json_format(self, tmp_path, dirty_with_one_file):
+        """Hook script run end-to-end prints valid JSON with required fields."""
         result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
+            [PY, *_ISOLATED, STOP_HOOK],
+            env=_env(CLAUDE_PROJECT_DIR=str(tmp_path)),
             input="{}",
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
             text=True,
         )
         output = json.loads(result.stdout)
         assert "decision" in output
         assert "reason" in output
 
-    def test_deduplicates_files(self, tmp_path):
+    def test_deduplicates_files(self, tmp_path, dirty_file, stop_hook):
         """Hook deduplicates file paths in output."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
         dirty_file.write_text("/file.py\n/file.py\n/file.py\n")
 
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input="{}",
-            capture_output=True,
-            text=True,
-        )
-        output = json.loads(result.stdout)
+        _, stdout, _ = stop_hook.run("{}", env)
+        output = json.loads(stdout)
         # Should only mention file once
-        assert output["reason"].count("/file.py") == 1
+        assert _listed_files(stop_hook, output["reason"]) == ["/file.py"]
 
-    def test_limits_file_count(self, tmp_path):
+    def test_limits_file_count(self, tmp_path, dirty_file, stop_hook):
         """Hook limits file list to 20 files max."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
         files = [f"/file{i}.py" for i in range(30)]
         dirty_file.write_text("\n".join(files) + "\n")
 
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input="{}",
-            capture_output=True,
-            text=True,
-        )
-        output = json.loads(result.stdout)
-        # Extract the file list portion and count files
-        reason = output["reason"]
-        # Files are listed after "changed files: " and before the next sentence
-        files_part = reason.split("changed files: ")[1].split("'.")[0]
-        file_count = files_part.count(",") + 1
-        assert file_count <= 20
-
-    def test_handles_invalid_json_input(self, tmp_path):
-        """Hook handles invalid JSON input gracefully."""
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
-        dirty_file.parent.mkdir(parents=True)
-        dirty_file.write_text("/path/to/file.py\n")
+        _, stdout, _ = stop_hook.run("{}", env)
+        output = json.loads(stdout)
+        assert len(_listed_files(stop_hook, output["reason"])) == 20
+
+    def test_limit_keeps_latest_files(self, tmp_path, dirty_file, stop_hook):
+        """Hook lists the 20 most recently tracked files."""
+        files = [f"/file{i:02d}.py" for i in range(25)]
+        dirty_file.write_text("\n".join(files) + "\n")
 
         env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        result = subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "stop.py"],
-            env={**os.environ, **env},
-            input="not valid json",
-            capture_output=True,
-            text=True,
-        )
+        _, stdout, _ = stop_hook.run("{}", env)
+        reason = json.loads(stdout)["reason"]
+        assert _listed_files(stop_hook, reason) == files[5:]
+
+    def test_dedupe_and_limit_caps_file_count(self, stop_hook):
+        """dedupe_and_limit keeps at most max_n paths."""
+        lines = [f"/f{i}.py".encode() for i in range(30)]
+        assert len(stop_hook.dedupe_and_limit(lines)) == 20
+        assert len(stop_hook.dedupe_and_limit(lines, max_n=5)) == 5
+
+    def test_dedupe_and_limit_strips_commit_context(self, stop_hook):
+        """dedupe_and_limit drops inline commit context and blank lines."""
+        lines = [b"/a.py [abc1234: Add a]", b"", b"/a.py", b"/b.py"]
+        assert stop_hook.dedupe_and_limit(lines) == ["/a.py", "/b.py"]
+
+    def test_reads_only_tail_of_large_log(self, tmp_path, dirty_file, stop_hook):
+        """Hook ignores entries beyond the tail window of a large log."""
+        dirty_file.write_text("/old.py\n" + "/pad.py\n" * 9000 + "/new.py\n")
+
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        _, stdout, _ = stop_hook.run("{}", env)
+        reason = json.loads(stdout)["reason"]
+        assert _listed_files(stop_hook, reason) == ["/new.py", "/pad.py"]
+
+    def test_handles_invalid_json_input(self, tmp_path, dirty_with_one_file, stop_hook):
+        """Hook handles invalid JSON input gracefully."""
+        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
+        rc, stdout, _ = stop_hook.run("not valid json", env)
         # Should still work, treating input as empty
-        assert result.returncode == 0
-        output = json.loads(result.stdout)
+        assert rc == 0
+        output = json.loads(stdout)
         assert output["decision"] == "block"
 
 
+@pytest.mark.skipif(not HAS_GIT, reason="git not installed")
 class TestGitCommitContext:
     """Tests for git commit context enrichment."""
 
-    def _make_bash_input(self, command: str) -> str:
-        """Create JSON input for Bash tool."""
-        return json.dumps({
-            "tool_name": "Bash",
-            "tool_input": {"command": command},
-        })
-
-    def _init_git_repo(self, tmp_path):
-        """Initialize a git repo with an initial commit.
-
-        Creates an initial commit so subsequent commits have a parent
-        for git diff-tree to compare against.
-        """
-        subprocess.run(["git", "init"], cwd=tmp_path, capture_output=True)
-        subprocess.run(
-            ["git", "config", "user.email", "test@test.com"],
-            cwd=tmp_path,
-            capture_output=True,
-        )
-        subprocess.run(
-            ["git", "config", "user.name", "Test User"],
-            cwd=tmp_path,
-            capture_output=True,
-        )
-        # Create initial commit so later commits have a parent
-        init_file = tmp_path / ".gitkeep"
-        init_file.write_text("")
-        subprocess.run(["git", "add", ".gitkeep"], cwd=tmp_path, capture_output=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Initial commit"],
-            cwd=tmp_path,
-            capture_output=True,
-        )
-
-    def test_handle_git_commit_non_git_directory(self, tmp_path):
+    def test_handle_git_commit_non_git_directory(self, tmp_path, post_tool_use):
         """handle_git_commit returns empty when not a git repo."""
-        # Import the function directly
-        sys.path.insert(0, str(SCRIPTS_DIR))
-        from importlib import import_module
-        post_tool_use = import_module("post-tool-use")
-
         files, context = post_tool_use.handle_git_commit(str(tmp_path))
 
         assert files == []
         assert context is None
 
-        # Cleanup
-        sys.path.pop(0)
-        sys.modules.pop("post-tool-use", None)
-
-    def test_handle_git_commit_extracts_files_and_context(self, tmp_path):
+    def test_handle_git_commit_extracts_files_and_context(self, git_repo, post_tool_use):
         """handle_git_commit extracts files and commit context from git."""
-        # Initialize git repo
-        self._init_git_repo(tmp_path)
-
         # Create and commit a file
-        test_file = tmp_path / "feature.py"
+        test_file = git_repo / "feature.py"
         test_file.write_text("print('hello')")
-        subprocess.run(["git", "add", "feature.py"], cwd=tmp_path, capture_output=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Add feature"],
-            cwd=tmp_path,
-            capture_output=True,
-        )
-
-        # Import the function directly
-        sys.path.insert(0, str(SCRIPTS_DIR))
-        from importlib import import_module
-        post_tool_use = import_module("post-tool-use")
+        _git_commit(git_repo, "feature.py", "Add feature")
 
-        files, context = post_tool_use.handle_git_commit(str(tmp_path))
+        files, context = post_tool_use.handle_git_commit(str(git_repo))
 
         # Verify files list contains our file
         assert len(files) == 1
@@ -548,37 +649,21 @@ class TestGitCommitContext:
         assert len(context["hash"]) == 7  # Short hash
         assert context["message"] == "Add feature"
 
-        # Cleanup
-        sys.path.pop(0)
-        sys.modules.pop("post-tool-use", None)
-
-    def test_commit_enriches_dirty_files_with_context(self, tmp_path):
+    def test_commit_enriches_dirty_files_with_context(self, git_repo, spawn_counter, post_tool_use):
         """Git commit command enriches dirty files with inline context."""
-        # Initialize git repo
-        self._init_git_repo(tmp_path)
-
         # Create and commit a file
-        test_file = tmp_path / "module.py"
+        test_file = git_repo / "module.py"
         test_file.write_text("# module")
-        subprocess.run(["git", "add", "module.py"], cwd=tmp_path, capture_output=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Add module"],
-            cwd=tmp_path,
-            capture_output=True,
-        )
+        _git_commit(git_repo, "module.py", "Add module")
 
         # Run hook with git commit command
-        env = {"CLAUDE_PROJECT_DIR": str(tmp_path)}
-        subprocess.run(
-            [sys.executable, SCRIPTS_DIR / "post-tool-use.py"],
-            env={**os.environ, **env},
-            input=self._make_bash_input("git commit -m 'Add module'"),
-            capture_output=True,
-            text=True,
-        )
+        env = {"CLAUDE_PROJECT_DIR": str(git_repo)}
+        spawns_before = spawn_counter[0]
+        post_tool_use.run(_make_bash_input("git commit -m 'Add module'"), env)
+        assert spawn_counter[0] - spawns_before == 1  # One git log call
 
         # Check dirty files contain commit context
-        dirty_file = tmp_path / ".claude" / "auto-memory" / "dirty-files"
+        dirty_file = git_repo / ".claude" / "auto-memory" / "dirty-files"
         assert dirty_file.exists()
         content = dirty_file.read_text()
 
@@ -587,3 +672,21 @@ class TestGitCommitContext:
         assert "[" in content  # Context marker
         assert ":" in content  # hash: message separator
         assert "Add module" in content
+
+    def test_gitmode_tracks_commit(self, git_repo, post_tool_use):
+        """Git commit is still tracked when triggerMode is gitmode."""
+        config_file = git_repo / ".claude" / "auto-memory" / "config.json"
+        config_file.parent.mkdir(parents=True)
+        config_file.write_text('{"triggerMode": "gitmode"}')
+
+        test_file = git_repo / "module.py"
+        test_file.write_text("# module")
+        _git_commit(git_repo, "module.py", "Add module")
+
+        env = {"CLAUDE_PROJECT_DIR": str(git_repo)}
+        post_tool_use.run(_make_bash_input("git commit -m 'Add module'"), env)
+
+        dirty_file = git_repo / ".claude" / "auto-memory" / "dirty-files"
+        content = dirty_file.read_text()
+        assert "module.py" in content
+        assert "Add module" in content
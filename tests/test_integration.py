@@ -1,35 +1,71 @@
 """Integration tests for auto-memory plugin."""
-import json
+import functools
+import os
 import re
 from pathlib import Path
+from types import MappingProxyType
 
 import pytest
 import yaml
 
+# libyaml-backed loader when PyYAML was built with it, bound once at import
+_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# orjson parses JSON in C when installed; the stdlib parser is the fallback
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 PROJECT_ROOT = Path(__file__).parent.parent
+AGENT_PATH = PROJECT_ROOT / "agents" / "memory-updater.md"
+COMMANDS_DIR = PROJECT_ROOT / "commands"
 
+_SEMVER_RE = re.compile(r"^\d+\.\d+\.\d+$")
 
-def parse_markdown_frontmatter(file_path: Path) -> dict:
-    """Parse YAML frontmatter from a markdown file."""
-    content = file_path.read_text()
-    if not content.startswith("---"):
-        return {}
 
-    end_idx = content.find("---", 3)
-    if end_idx == -1:
-        return {}
+# Read size when scanning a markdown file for its closing frontmatter delimiter
+_CHUNK = 4096
+
 
-    yaml_content = content[3:end_idx].strip()
-    return yaml.safe_load(yaml_content) or {}
+def _read_frontmatter_bytes(file_path: Path) -> bytes:
+    """Return the bytes between the opening and closing --- of a markdown file.
+
+    Reads in chunks and stops at the closing delimiter, so the body is never
+    loaded. Returns b"" when the file has no frontmatter block.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read(_CHUNK)
+        if data[:3] != b"---":
+            return b""
+        start = 3
+        while (end := data.find(b"---", start)) == -1:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                return b""
+            start = max(3, len(data) - 2)  # Delimiter may straddle chunks
+            data += chunk
+    return data[3:end]
+
+
+@functools.cache
+def parse_markdown_frontmatter(file_path: Path) -> dict:
+    """Parse YAML frontmatter from a markdown file.
+
+    Cached per path: the files are not modified during a test run, so each
+    is read and parsed once. Callers must not mutate the returned dict.
+    """
+    # PyYAML decodes UTF-8 bytes itself
+    return yaml.load(_read_frontmatter_bytes(file_path), Loader=_LOADER) or {}
 
 
 class TestPluginConfiguration:
     """Tests for plugin.json configuration."""
 
-    @pytest.fixture
-    def plugin_json(self):
+    @pytest.fixture(scope="session")
+    def plugin_json(self, file_text):
         path = PROJECT_ROOT / ".claude-plugin" / "plugin.json"
-        return json.loads(path.read_text())
+        return MappingProxyType(_json_loads(file_text(path)))
 
     def test_plugin_json_exists(self):
         """plugin.json exists."""
@@ -48,16 +84,16 @@ class TestPluginConfiguration:
     def test_plugin_version_format(self, plugin_json):
         """Version follows semver format."""
         version = plugin_json["version"]
-        assert re.match(r"^\d+\.\d+\.\d+$", version)
+        assert _SEMVER_RE.match(version)
 
 
 class TestHooksConfiguration:
     """Tests for hooks.json configuration."""
 
-    @pytest.fixture
-    def hooks_json(self):
+    @pytest.fixture(scope="session")
+    def hooks_json(self, file_text):
         path = PROJECT_ROOT / "hooks" / "hooks.json"
-        return json.loads(path.read_text())
+        return MappingProxyType(_json_loads(file_text(path)))
 
     def test_hooks_json_exists(self):
         """hooks.json exists."""
@@ -75,6 +111,12 @@ class TestHooksConfiguration:
         """Stop hook is configured."""
         assert "Stop" in hooks_json["hooks"]
 
+    def test_hook_commands_skip_site(self, hooks_json):
+        """Hook commands run python3 -S (stdlib-only scripts skip site import)."""
+        for event in ("PostToolUse", "Stop"):
+            for hook in hooks_json["hooks"][event][0]["hooks"]:
+                assert hook["command"].startswith("python3 -S ")
+
     def test_post_tool_use_matcher(self, hooks_json):
         """PostToolUse hook has Edit|Write|Bash matcher."""
         post_tool_use = hooks_json["hooks"]["PostToolUse"][0]
@@ -84,92 +126,103 @@ class TestHooksConfiguration:
 class TestAgentConfiguration:
     """Tests for agent definitions."""
 
-    @pytest.fixture
-    def agent_path(self):
-        return PROJECT_ROOT / "agents" / "memory-updater.md"
-
-    def test_agent_exists(self, agent_path):
+    def test_agent_exists(self):
         """Agent file exists."""
-        assert agent_path.exists()
+        assert AGENT_PATH.exists()
 
-    def test_agent_yaml_valid(self, agent_path):
+    def test_agent_yaml_valid(self):
         """Agent has valid YAML frontmatter."""
-        frontmatter = parse_markdown_frontmatter(agent_path)
+        frontmatter = parse_markdown_frontmatter(AGENT_PATH)
         assert frontmatter is not None
 
-    def test_agent_has_name(self, agent_path):
+    def test_agent_has_name(self):
         """Agent has name field."""
-        frontmatter = parse_markdown_frontmatter(agent_path)
+        frontmatter = parse_markdown_frontmatter(AGENT_PATH)
         assert "name" in frontmatter
         assert frontmatter["name"] == "memory-updater"
 
-    def test_agent_has_description(self, agent_path):
+    def test_agent_has_description(self):
         """Agent has description field."""
-        frontmatter = parse_markdown_frontmatter(agent_path)
+        frontmatter = parse_markdown_frontmatter(AGENT_PATH)
         assert "description" in frontmatter
 
-    def test_agent_uses_sonnet(self, agent_path):
+    def test_agent_uses_sonnet(self):
         """Agent uses sonnet model (haiku doesn't support extended thinking)."""
-        frontmatter = parse_markdown_frontmatter(agent_path)
+        frontmatter = parse_markdown_frontmatter(AGENT_PATH)
         assert frontmatter.get("model") == "sonnet"
 
 
 class TestCommandsConfiguration:
     """Tests for command definitions."""
 
-    @pytest.fixture
-    def commands_dir(self):
-        return PROJECT_ROOT / "commands"
-
-    def test_init_exists(self, commands_dir):
+    def test_init_exists(self):
         """init command exists."""
-        assert (commands_dir / "init.md").exists()
+        assert (COMMANDS_DIR / "init.md").exists()
 
-    def test_calibrate_exists(self, commands_dir):
+    def test_calibrate_exists(self):
         """calibrate command exists."""
-        assert (commands_dir / "calibrate.md").exists()
+        assert (COMMANDS_DIR / "calibrate.md").exists()
 
-    def test_status_exists(self, commands_dir):
+    def test_status_exists(self):
         """status command exists."""
-        assert (commands_dir / "status.md").exists()
+        assert (COMMANDS_DIR / "status.md").exists()
 
-    def test_commands_have_yaml(self, commands_dir):
+    def test_commands_have_yaml(self):
         """All commands have valid YAML frontmatter."""
-        for cmd_file in commands_dir.glob("*.md"):
-            frontmatter = parse_markdown_frontmatter(cmd_file)
-            assert "description" in frontmatter, f"{cmd_file.name} missing description"
+        cmd_files = [
+            Path(entry.path)
+            for entry in os.scandir(COMMANDS_DIR)
+            if entry.name.endswith(".md") and entry.is_file()
+        ]
+        assert cmd_files
+        missing = [f.name for f in cmd_files if "description" not in parse_markdown_frontmatter(f)]
+        assert not missing, f"commands missing description: {missing}"
 
 
 class TestFileStructure:
     """Tests for overall file structure."""
 
-    def test_scripts_directory_exists(self):
+    @pytest.fixture(scope="session")
+    def root_entries(self):
+        """Project root listing from a single scandir."""
+        return {entry.name: entry for entry in os.scandir(PROJECT_ROOT)}
+
+    @pytest.fixture(scope="session")
+    def script_entries(self):
+        """scripts/ listing from a single scandir."""
+        return {entry.name: entry for entry in os.scandir(PROJECT_ROOT / "scripts")}
+
+    def test_scripts_directory_exists(self, root_entries):
         """scripts/ directory exists."""
-        assert (PROJECT_ROOT / "scripts").is_dir()
+        assert root_entries["scripts"].is_dir()
 
-    def test_skills_directory_exists(self):
+    def test_skills_directory_exists(self, root_entries):
         """skills/ directory exists."""
-        assert (PROJECT_ROOT / "skills").is_dir()
+        assert root_entries["skills"].is_dir()
 
-    def test_agents_directory_exists(self):
+    def test_agents_directory_exists(self, root_entries):
         """agents/ directory exists."""
-        assert (PROJECT_ROOT / "agents").is_dir()
+        assert root_entries["agents"].is_dir()
 
-    def test_commands_directory_exists(self):
+    def test_commands_directory_exists(self, root_entries):
         """commands/ directory exists."""
-        assert (PROJECT_ROOT / "commands").is_dir()
+        assert root_entries["commands"].is_dir()
 
-    def test_hooks_directory_exists(self):
+    def test_hooks_directory_exists(self, root_entries):
         """hooks/ directory exists."""
-        assert (PROJECT_ROOT / "hooks").is_dir()
+        assert root_entries["hooks"].is_dir()
 
-    def test_post_tool_use_script_exists(self):
+    def test_post_tool_use_script_exists(self, script_entries):
         """post-tool-use.py script exists."""
-        assert (PROJECT_ROOT / "scripts" / "post-tool-use.py").exists()
+        assert "post-tool-use.py" in script_entries
+
+    def test_post_tool_use_module_exists(self, script_entries):
+        """post_tool_use.py module loaded by the launcher exists."""
+        assert "post_tool_use.py" in script_entries
 
-    def test_stop_script_exists(self):
+    def test_stop_script_exists(self, script_entries):
         """stop.py script exists."""
-        assert (PROJECT_ROOT / "scripts" / "stop.py").exists()
+        assert "stop.py" in script_entries
 
     def test_dev_marketplace_exists(self):
         """.dev-marketplace directory exists for local development."""
@@ -5,63 +5,102 @@ from pathlib import Path
 import pytest
 import yaml
 
-SKILLS_DIR = Path(__file__).parent.parent / "skills"
+# libyaml-backed loader when PyYAML was built with it, bound once at import
+_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
+SKILLS_DIR = Path(__file__).parent.parent / "skills"
 
-def parse_skill_frontmatter(skill_path: Path) -> dict:
-    """Parse YAML frontmatter from a skill file."""
-    content = skill_path.read_text()
-    if not content.startswith("---"):
+MEMORY_PROCESSOR_SKILL = SKILLS_DIR / "memory-processor" / "SKILL.md"
+CODEBASE_ANALYZER_SKILL = SKILLS_DIR / "codebase-analyzer" / "SKILL.md"
+TEMPLATES_DIR = SKILLS_DIR / "codebase-analyzer" / "templates"
+ROOT_TEMPLATE = TEMPLATES_DIR / "CLAUDE.root.md.template"
+SUBTREE_TEMPLATE = TEMPLATES_DIR / "CLAUDE.subtree.md.template"
+
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# Marker strings checked across skill and template files
+_MARKERS = (
+    "AUTO-MANAGED",
+    "END AUTO-MANAGED",
+    "<!-- AUTO-MANAGED:",
+    "<!-- END AUTO-MANAGED -->",
+    "<!-- MANUAL -->",
+    "<!-- END MANUAL -->",
+    "{{MODULE_NAME}}",
+)
+
+
+def parse_skill_frontmatter(content: str) -> dict:
+    """Parse YAML frontmatter from skill file content."""
+    # ["", frontmatter, body] when the content opens with a --- delimited block
+    parts = content.split("---", 2)
+    if len(parts) < 3 or parts[0]:
         return {}
 
-    # Find the closing ---
-    end_idx = content.find("---", 3)
-    if end_idx == -1:
-        return {}
+    return yaml.load(parts[1], Loader=_LOADER) or {}
+
+
+@pytest.fixture(scope="session")
+def markers_in(file_text):
+    """Return a lookup of which known markers each file contains.
 
-    yaml_content = content[3:end_idx].strip()
-    return yaml.safe_load(yaml_content) or {}
+    Each file is scanned once for all markers; tests then check membership.
+    """
+    found: dict[Path, frozenset[str]] = {}
+
+    def scan(path: Path) -> frozenset[str]:
+        if path not in found:
+            text = file_text(path)
+            found[path] = frozenset(marker for marker in _MARKERS if marker in text)
+        return found[path]
+
+    return scan
+
+
+@pytest.fixture(scope="class")
+def skill_bundle(request, file_text):
+    """Content and parsed frontmatter of the test class's SKILL_PATH, read once."""
+    content = file_text(request.cls.SKILL_PATH)
+    return content, parse_skill_frontmatter(content)
 
 
 class TestMemoryProcessorSkill:
     """Tests for memory-processor skill."""
 
-    @pytest.fixture
-    def skill_path(self):
-        return SKILLS_DIR / "memory-processor" / "SKILL.md"
+    SKILL_PATH = MEMORY_PROCESSOR_SKILL
 
-    def test_yaml_valid(self, skill_path):
+    def test_yaml_valid(self, skill_bundle):
         """Skill has valid YAML frontmatter."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert frontmatter is not None
         assert isinstance(frontmatter, dict)
 
-    def test_has_name(self, skill_path):
+    def test_has_name(self, skill_bundle):
         """Skill has a name field."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert "name" in frontmatter
         assert frontmatter["name"] == "memory-processor"
 
-    def test_has_description(self, skill_path):
+    def test_has_description(self, skill_bundle):
         """Skill has a description field."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert "description" in frontmatter
         assert len(frontmatter["description"]) > 0
 
-    def test_has_algorithm(self, skill_path):
+    def test_has_algorithm(self, skill_bundle):
         """Skill contains algorithm section."""
-        content = skill_path.read_text()
+        content, _ = skill_bundle
         assert "## Algorithm" in content
 
-    def test_has_marker_syntax(self, skill_path):
+    def test_has_marker_syntax(self, markers_in):
         """Skill documents marker syntax."""
-        content = skill_path.read_text()
-        assert "AUTO-MANAGED" in content
-        assert "END AUTO-MANAGED" in content
+        markers = markers_in(self.SKILL_PATH)
+        assert "AUTO-MANAGED" in markers
+        assert "END AUTO-MANAGED" in markers
 
-    def test_has_section_names(self, skill_path):
+    def test_has_section_names(self, skill_bundle):
         """Skill lists section names."""
-        content = skill_path.read_text()
+        content, _ = skill_bundle
         assert "project-description" in content
         assert "build-commands" in content
         assert "architecture" in content
@@ -70,100 +109,89 @@ class TestMemoryProcessorSkill:
 class TestCodebaseAnalyzerSkill:
     """Tests for codebase-analyzer skill."""
 
-    @pytest.fixture
-    def skill_path(self):
-        return SKILLS_DIR / "codebase-analyzer" / "SKILL.md"
-
-    @pytest.fixture
-    def templates_dir(self):
-        return SKILLS_DIR / "codebase-analyzer" / "templates"
+    SKILL_PATH = CODEBASE_ANALYZER_SKILL
 
-    def test_yaml_valid(self, skill_path):
+    def test_yaml_valid(self, skill_bundle):
         """Skill has valid YAML frontmatter."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert frontmatter is not None
         assert isinstance(frontmatter, dict)
 
-    def test_has_name(self, skill_path):
+    def test_has_name(self, skill_bundle):
         """Skill has a name field."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert "name" in frontmatter
         assert frontmatter["name"] == "codebase-analyzer"
 
-    def test_has_description(self, skill_path):
+    def test_has_description(self, skill_bundle):
         """Skill has a description field."""
-        frontmatter = parse_skill_frontmatter(skill_path)
+        _, frontmatter = skill_bundle
         assert "description" in frontmatter
         assert len(frontmatter["description"]) > 0
 
-    def test_has_algorithm(self, skill_path):
+    def test_has_algorithm(self, skill_bundle):
         """Skill contains algorithm section."""
-        content = skill_path.read_text()
+        content, _ = skill_bundle
         assert "## Algorithm" in content or "### 1." in content
 
-    def test_references_templates(self, skill_path):
+    def test_references_templates(self, skill_bundle):
         """Skill references template files."""
-        content = skill_path.read_text()
+        content, _ = skill_bundle
         assert "template" in content.lower()
 
-    def test_templates_exist(self, templates_dir):
+    def test_templates_exist(self):
         """Template files exist."""
-        assert (templates_dir / "CLAUDE.root.md.template").exists()
-        assert (templates_dir / "CLAUDE.subtree.md.template").exists()
+        assert ROOT_TEMPLATE.exists()
+        assert SUBTREE_TEMPLATE.exists()
 
 
 class TestTemplates:
     """Tests for CLAUDE.md templates."""
 
-    @pytest.fixture
-    def root_template(self):
-        return SKILLS_DIR / "codebase-analyzer" / "templates" / "CLAUDE.root.md.template"
+    @pytest.fixture(scope="session")
+    def root_content(self, file_text):
+        """Root template text, read once."""
+        return file_text(ROOT_TEMPLATE)
 
-    @pytest.fixture
-    def subtree_template(self):
-        return SKILLS_DIR / "codebase-analyzer" / "templates" / "CLAUDE.subtree.md.template"
+    @pytest.fixture(scope="session")
+    def subtree_content(self, file_text):
+        """Subtree template text, read once."""
+        return file_text(SUBTREE_TEMPLATE)
 
-    def test_root_has_markers(self, root_template):
+    def test_root_has_markers(self, markers_in):
         """Root template has AUTO-MANAGED markers."""
-        content = root_template.read_text()
-        assert "<!-- AUTO-MANAGED:" in content
-        assert "<!-- END AUTO-MANAGED -->" in content
+        markers = markers_in(ROOT_TEMPLATE)
+        assert "<!-- AUTO-MANAGED:" in markers
+        assert "<!-- END AUTO-MANAGED -->" in markers
 
-    def test_root_has_manual_section(self, root_template):
+    def test_root_has_manual_section(self, markers_in):
         """Root template has MANUAL section."""
-        content = root_template.read_text()
-        assert "<!-- MANUAL -->" in content
-        assert "<!-- END MANUAL -->" in content
+        markers = markers_in(ROOT_TEMPLATE)
+        assert "<!-- MANUAL -->" in markers
+        assert "<!-- END MANUAL -->" in markers
 
-    def test_root_has_placeholders(self, root_template):
+    def test_root_has_placeholders(self, root_content):
         """Root template has placeholder variables."""
-        content = root_template.read_text()
-        placeholders = re.findall(r"\{\{(\w+)\}\}", content)
-        assert len(placeholders) > 0
+        placeholders = {m.group(1) for m in _PLACEHOLDER_RE.finditer(root_content)}
         assert "DESCRIPTION" in placeholders
         assert "BUILD_COMMANDS" in placeholders
 
-    def test_root_token_budget(self, root_template):
+    def test_root_token_budget(self, root_content):
         """Root template stays within token budget (150-200 lines)."""
-        content = root_template.read_text()
-        lines = content.split("\n")
         # Template should be under 100 lines (content expands when filled)
-        assert len(lines) < 100
+        assert root_content.count("\n") + 1 < 100
 
-    def test_subtree_has_markers(self, subtree_template):
+    def test_subtree_has_markers(self, markers_in):
         """Subtree template has AUTO-MANAGED markers."""
-        content = subtree_template.read_text()
-        assert "<!-- AUTO-MANAGED:" in content
-        assert "<!-- END AUTO-MANAGED -->" in content
+        markers = markers_in(SUBTREE_TEMPLATE)
+        assert "<!-- AUTO-MANAGED:" in markers
+        assert "<!-- END AUTO-MANAGED -->" in markers
 
-    def test_subtree_has_module_name(self, subtree_template):
+    def test_subtree_has_module_name(self, markers_in):
         """Subtree template has MODULE_NAME placeholder."""
-        content = subtree_template.read_text()
-        assert "{{MODULE_NAME}}" in content
+        assert "{{MODULE_NAME}}" in markers_in(SUBTREE_TEMPLATE)
 
-    def test_subtree_token_budget(self, subtree_template):
+    def test_subtree_token_budget(self, subtree_content):
         """Subtree template stays within token budget (50-75 lines)."""
-        content = subtree_template.read_text()
-        lines = content.split("\n")
         # Template should be under 50 lines
-        assert len(lines) < 50
+        assert subtree_content.count("\n") + 1 < 50